@@ -0,0 +1,169 @@
+"""Memory benchmark of the register catalog and sample collection.
+
+Loads a synthetic register map through the regular CSV parser, assembles
+the measurement groups and collects a number of samples against a fake
+Modbus client. Reports the memory held by the catalog, the additional peak
+memory of sampling and the time needed per sample of all groups.
+
+    python -m benchmark.memory [--tags 100000] [--devices 100] [--samples 10]
+
+The script also runs against revisions before the compact catalog, which
+collected a list of tag values per sample. To reproduce the "before" numbers,
+check out the baseline next to the current tree and put it on the path:
+
+    git worktree add /tmp/baseline 10290f2
+    PYTHONPATH=/tmp/baseline python benchmark/memory.py
+
+Loading takes a few minutes there as the old parser copies the remaining
+lines for every register.
+"""
+import argparse
+import asyncio
+import csv
+import gc
+import inspect
+import io
+import time
+import tracemalloc
+from enum import Enum
+
+from modbus_reader.core import assemble_groups, collect_data, format_message
+from modbus_reader.parser import RegisterLoader, CsvParser
+
+HEADER = ['Register', 'Words', 'Format', 'Value', 'Min', 'Max', 'Description', 'Tag', 'Group', 'Device', 'Unit ID']
+COLUMNS = {
+    'number': ['Reg.*'],
+    'size': ['Words'],
+    'type': ['Format'],
+    'uom': ['UOM'],
+    'value': ['Val.*'],
+    'min': ['Min'],
+    'max': ['Max'],
+    'tag': ['Tag'],
+    'description': ['Desc.*'],
+    'device': ['Dev.*'],
+    'unit': ['Unit.?I[Dd]'],
+    'group': ['Group'],
+}
+GROUP_SIZE = 50
+
+
+class FakeResponse:
+
+    def __init__(self, count):
+        self.registers = [0, 42] * (count // 2)
+
+    def isError(self):
+        return False
+
+
+class FakeClient:
+    """Mimics the parts of the pymodbus client used by `collect_data`."""
+
+    class DATATYPE(Enum):
+        INT32 = 'i'
+
+    async def read_holding_registers(self, address, count, device_id=1):
+        return FakeResponse(count)
+
+    def convert_from_registers(self, registers, data_type, word_order):
+        return registers[1::2]
+
+
+def generate_lines(tags, devices):
+    """Generate the register map lines of a fleet of identical devices.
+
+    Every 10th register is a bit register with 8 tags; the last register of a
+    device is never a bit register (older parsers fail on a trailing one).
+    The registers of each
+    device are split across two units; the unit id is only given on the first
+    register of each unit.
+    """
+    lines = [HEADER]
+    per_device = tags // devices
+    for device in range(devices):
+        number = 40000
+        count = 0
+        unit = None
+        while count < per_device:
+            group = f'group{count // GROUP_SIZE}'
+            unit_cell = ''
+            if unit != count * 2 // per_device + 1:
+                unit = count * 2 // per_device + 1
+                unit_cell = str(unit)
+            if number % 20 == 0 and count + 8 < per_device:
+                lines.append([str(number), '2', 'BIT', '', '', '', '', 'MULTIPLE', group, f'device{device}', unit_cell])
+                for bit in range(8):
+                    lines.append(['', '', '', '', str(2 ** bit), '', f'Flag {number}/{bit}', f'{group}.flag_{number}_{bit}', '', '', ''])
+                count += 8
+            else:
+                lines.append([str(number), '2', 'DEC 1', '', '0', '100', f'Temperature {number}', f'{group}.temp_{number}', group, f'device{device}', unit_cell])
+                count += 1
+            number += 2
+    return lines
+
+
+# revisions before the compact catalog return the tag values of a sequence
+COMPACT = 'values' in inspect.signature(collect_data).parameters
+
+
+async def sample(groups, samples):
+    client = FakeClient()
+    for i in range(samples):
+        for group in groups:
+            if COMPACT:
+                for sequence, index in zip(group.sequences, group.offsets):
+                    await collect_data(client, sequence, group.values, index)
+                format_message(time.time(), group.device, group)
+            else:
+                tag_values = []
+                for sequence in group.sequences:
+                    tag_values.extend(await collect_data(client, sequence))
+                format_message(time.time(), group.device, group.name, tag_values)
+
+
+def count_tags(groups):
+    if COMPACT:
+        return sum(len(group.tags) for group in groups)
+    return sum(len(tuple(register.parse(0))) for group in groups for sequence in group.sequences for register in sequence)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--tags", type=int, default=100_000)
+    arg_parser.add_argument("--devices", type=int, default=100)
+    arg_parser.add_argument("--samples", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    text = io.StringIO()
+    csv.writer(text).writerows(generate_lines(args.tags, args.devices))
+    text = text.getvalue()
+    loader = RegisterLoader()
+    loader.set_columns(**COLUMNS)
+
+    gc.collect()
+    tracemalloc.start()
+    lines = CsvParser().read_lines(io.StringIO(text))
+    registers = loader.load_from_lines(lines)
+    groups = assemble_groups(registers)
+    del lines, registers
+    gc.collect()
+    catalog, _ = tracemalloc.get_traced_memory()
+    tags = count_tags(groups)
+
+    tracemalloc.reset_peak()
+    asyncio.run(sample(groups, args.samples))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    asyncio.run(sample(groups, args.samples))
+    duration = (time.perf_counter() - started) / args.samples
+
+    print(f"Tags:              {tags} ({len(groups)} measurement groups)")
+    print(f"Catalog:           {catalog / 2**20:.1f} MiB ({catalog / tags:.0f} bytes/tag)")
+    print(f"Sampling peak:     {(peak - catalog) / 2**20:.1f} MiB above catalog")
+    print(f"Sample duration:   {duration * 1000:.0f} ms (all groups)")
+
+if __name__ == "__main__":
+    main()
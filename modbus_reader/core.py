@@ -2,6 +2,8 @@ import json
 import logging
 from datetime import datetime, timezone
 
+from pymodbus.exceptions import ModbusException
+
 from modbus_reader.model import MeasurementGroup
 
 log = logging.getLogger(__name__)
@@ -28,66 +30,84 @@ def assemble_groups(registers):
         elif previous.group != register.group:
             log.info(f"Stopping sequence: Group differs ({register.group}).")
             stop = True
+        elif previous.device != register.device:
+            log.info(f"Stopping sequence: Device differs ({register.device}).")
+            stop = True
+        elif previous.unit != register.unit:
+            log.info(f"Stopping sequence: Unit differs ({register.unit}).")
+            stop = True
 
         if not stop:
             log.debug(f"Adding to sequence: {register.number}")
             chunk.append(register)
         else:
             log.info(f"Found register sequence: {chunk[0].number} - {chunk[-1].number}, Group {chunk[0].group}")
-            sequences.append(chunk)
+            sequences.append(tuple(chunk))
             chunk = [register]
             stop = False
 
         previous = register
 
     log.info(f"Found final sequence: {chunk[0].number} - {chunk[-1].number}, Group {chunk[0].group}")
-    sequences.append(chunk)
+    sequences.append(tuple(chunk))
 
-    # order sequences by their group
+    # order sequences by their device and group
     groups = {}
     for sequence in sequences:
-        name = sequence[0].group
-        if not name in groups:
-            groups[name] = [sequence]
+        key = sequence[0].device, sequence[0].group
+        if not key in groups:
+            groups[key] = [sequence]
         else:
-            groups[name].append(sequence)
+            groups[key].append(sequence)
 
-    return [MeasurementGroup(name, sequences) for name, sequences in groups.items()]
+    return [MeasurementGroup(name, sequences, device) for (device, name), sequences in groups.items()]
 
 
-async def collect_data(client, sequence):
+async def collect_data(client, sequence, values, index):
+    """Read a register sequence into the values of a sample.
 
+    The values are stored starting at `index`, the number of the sequence's
+    first tag within its measurement group. Returns whether the registers
+    could be read; if not (error response or exception, e.g. a timeout), the
+    values of the sequence's tags are reset to None.
+    """
     start_number = sequence[0].number
     start_offset = start_number if start_number < 40000 else start_number - 40000
     num_words = len(sequence) * sequence[0].size
-    log.info(f"Reading {len(sequence)} registers ({num_words} words) starting at {start_number} ({start_offset}) ...")
-
-    response = await client.read_holding_registers(start_offset, count=num_words)
-    if response.isError():
-        log.error("Error reading registers:", response)
-        return None
+    unit = sequence[0].unit
+    log.info(f"Reading {len(sequence)} registers ({num_words} words) starting at {start_number} ({start_offset}), Unit {unit} ...")
+
+    try:
+        response = await client.read_holding_registers(start_offset, count=num_words, device_id=unit)
+        error = response if response.isError() else None
+    except ModbusException as e:
+        error = e
+    if error is not None:
+        log.error(f"Error reading registers: {error}")
+        end = index + sum(len(register.tags()) for register in sequence)
+        for i in range(index, end):
+            values[i] = None
+        return False
 
     words = response.registers
     decoded = client.convert_from_registers(words, data_type=client.DATATYPE.INT32, word_order='big')  # todo: other data types
     if not isinstance(decoded, list):
         decoded = [decoded]
 
-    result = []
     for register, raw_value in zip(sequence, decoded):
-        tag_values = register.parse(raw_value)
-        for tag_value in tag_values:
-            log.debug(f"  - {register.number}  ->  {tag_value.tag} = <{tag_value.value}>")
-            result.append(tag_value)
+        index += register.parse(raw_value, values, index)
 
-    return result
+    return True
 
 
-def format_message(ts, device, group, tag_values):
+def format_message(ts, device, group):
     data = {'time': datetime.fromtimestamp(ts, timezone.utc).isoformat()}
-    for tag_value in tag_values:
-        l0, l1 = tag_value.tag.split('.')
+    for tag, value in zip(group.tags, group.values):
+        if value is None:
+            continue
+        l0, l1 = tag.split('.')
         if l0 not in data:
             data[l0] = {}
-        data[l0][l1] = tag_value.value
+        data[l0][l1] = value
 
     return f'te/device/{device}///m/', json.dumps(data)
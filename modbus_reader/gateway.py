@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from collections import deque, defaultdict
+
+log = logging.getLogger(__name__)
+
+
+class Gateway:
+    """Multiplexes the requests to all units behind one Modbus TCP gateway.
+
+    All units share the connection of the given client, which handles one
+    request at a time (pymodbus holds a lock for the whole transaction).
+    Waiting requests are started in round-robin order of their units so that
+    a slow unit cannot starve the others.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.busy = False
+        self.waiting = defaultdict(deque)  # unit -> futures of waiting requests
+        self.ring = deque()  # units with waiting requests, in round-robin order
+
+    @property
+    def DATATYPE(self):
+        return self.client.DATATYPE
+
+    def convert_from_registers(self, *args, **kwargs):
+        return self.client.convert_from_registers(*args, **kwargs)
+
+    async def read_holding_registers(self, address, count=1, device_id=1):
+        await self._acquire(device_id)
+        try:
+            return await self.client.read_holding_registers(address, count=count, device_id=device_id)
+        finally:
+            self._release()
+
+    async def _acquire(self, unit):
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[unit].append(future)
+        if unit not in self.ring:
+            self.ring.append(unit)
+        self._dispatch()
+        if not future.done():
+            log.debug(f"Request for unit {unit} waiting.")
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # was started already
+            else:
+                # the future may have been dropped by the dispatcher already
+                waiting = self.waiting.get(unit)
+                if waiting is not None and future in waiting:
+                    waiting.remove(future)
+                    if not waiting:
+                        del self.waiting[unit]
+                        self.ring.remove(unit)
+            raise
+
+    def _release(self):
+        self.busy = False
+        self._dispatch()
+
+    def _dispatch(self):
+        """Start the next waiting request, taking the units in turns."""
+        while self.ring and not self.busy:
+            unit = self.ring.popleft()
+            waiting = self.waiting[unit]
+            while waiting and waiting[0].done():
+                waiting.popleft()  # cancelled while waiting
+            if not waiting:
+                del self.waiting[unit]
+                continue
+            self.busy = True
+            waiting.popleft().set_result(None)
+            if waiting:
+                self.ring.append(unit)
+            else:
+                del self.waiting[unit]
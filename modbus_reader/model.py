@@ -1,36 +1,57 @@
+from array import array
+from sys import intern
+
 
 class TagValue:
+    __slots__ = ('tag', 'description', 'value')
+
     def __init__(self, tag, description, value):
-        self.tag = tag
-        self.description = description
+        self.tag = intern(tag)
+        self.description = intern(description)
         self.value = value
 
 
 class Register:
     """A holding register specification & parsing utility"""
 
-    def __init__(self, number, size, group):
+    __slots__ = ('number', 'size', 'group', 'device', 'unit')
+
+    def __init__(self, number, size, group, device='main', unit=None):
         self.number = int(number)
         self.size = int(size)
-        self.group = group
+        self.group = intern(group)
+        self.device = intern(device)
+        self.unit = unit  # Modbus unit (slave) id, None for the device's default
+
+    def tags(self) -> tuple[tuple[str, str]]:
+        """The (tag, description) pairs of all values this register evaluates to."""
+        pass
 
-    def parse(self, value) -> tuple[TagValue]:
-        """Parse the register value.
+    def parse(self, value, values, index) -> int:
+        """Parse the register value into the values of a sample.
 
-        The result is a sequence (tuple) as a single value might be evaluated
-        to multiple tag values being defined.
+        The values are stored starting at `index` as a single value might be
+        evaluated to multiple tag values being defined. Returns the number of
+        values stored.
         """
         pass
 
 
 class SimpleRegister(Register):
-    def __init__(self, number, size, group, tag, description):
-        super().__init__(number, size, group)
-        self.description = description
-        self.tag = tag
 
-    def parse(self, value):
-        return (TagValue(self.tag, self.description, self._parse(value)),)
+    __slots__ = ('tag', 'description')
+
+    def __init__(self, number, size, group, tag, description, device='main', unit=None):
+        super().__init__(number, size, group, device, unit)
+        self.description = intern(description)
+        self.tag = intern(tag)
+
+    def tags(self):
+        return ((self.tag, self.description),)
+
+    def parse(self, value, values, index):
+        values[index] = self._parse(value)
+        return 1
 
     def _parse(self, value):
         """Just parse the register's actual value."""
@@ -38,12 +59,18 @@ class SimpleRegister(Register):
 
 
 class IntRegister(SimpleRegister):
+
+    __slots__ = ()
+
     def _parse(self, value):
         return int(value)
 
 class DecimalRegister(SimpleRegister):
-    def __init__(self, number, size, group, tag, description, decimal_places):
-        super().__init__(number, size, group, tag, description)
+
+    __slots__ = ('decimal_places',)
+
+    def __init__(self, number, size, group, tag, description, decimal_places, device='main', unit=None):
+        super().__init__(number, size, group, tag, description, device, unit)
         self.decimal_places = decimal_places
 
     def _parse(self, value):
@@ -51,8 +78,10 @@ class DecimalRegister(SimpleRegister):
 
 class MapRegister(SimpleRegister):
 
-    def __init__(self, number, size, group, tag, description, value_parser, value_map):
-        super().__init__(number, size, group, tag, description)
+    __slots__ = ('value_parser', 'value_map')
+
+    def __init__(self, number, size, group, tag, description, value_parser, value_map, device='main', unit=None):
+        super().__init__(number, size, group, tag, description, device, unit)
         self.value_parser = value_parser
         self.value_map = value_map
 
@@ -62,32 +91,51 @@ class MapRegister(SimpleRegister):
 
 class BitRegister(Register):
 
-    def __init__(self, number, size, group, bit_map):
-        super().__init__(number, size, group)
+    __slots__ = ('bit_map',)
+
+    def __init__(self, number, size, group, bit_map, device='main', unit=None):
+        super().__init__(number, size, group, device, unit)
         self.bit_map = bit_map
 
-    def parse(self, value):
-        return (
-            TagValue(
-                tag_value.tag,
-                tag_value.description,
-                value=int(int(value) & bit_value > 0),
-            )
-            for bit_value, tag_value in self.bit_map.items()
-        )
+    def tags(self):
+        return tuple((tag_value.tag, tag_value.description) for tag_value in self.bit_map.values())
+
+    def parse(self, value, values, index):
+        value = int(value)
+        for i, bit_value in enumerate(self.bit_map, index):
+            values[i] = int(value & bit_value > 0)
+        return len(self.bit_map)
 
 
 class RegisterSequence:
     """A sequence of registers that can be read in one pass."""
 
+    __slots__ = ('registers', 'name')
+
     def __init__(self, registers):
         self.registers = registers
         self.name = registers[0].group
 
 
 class MeasurementGroup:
-    """A logical grouping of registers that are part of one sample."""
+    """A logical grouping of registers that are part of one sample.
+
+    All tags of the group are numbered consecutively; a sample is collected
+    into the preallocated `values` list, indexed by these tag numbers. The
+    `offsets` hold the number of the first tag of each register sequence.
+    """
+
+    __slots__ = ('name', 'sequences', 'device', 'tags', 'offsets', 'values')
 
-    def __init__(self, name, register_sequences):
+    def __init__(self, name, register_sequences, device='main'):
         self.name = name
         self.sequences = register_sequences
+        self.device = device
+        self.offsets = array('L')
+        tags = []
+        for sequence in register_sequences:
+            self.offsets.append(len(tags))
+            for register in sequence:
+                tags.extend(tag for tag, _ in register.tags())
+        self.tags = tuple(tags)
+        self.values = [None] * len(tags)
@@ -2,7 +2,6 @@ import csv
 import logging
 import os
 import re
-from itertools import count
 from typing import Self
 
 from modbus_reader.model import Register, IntRegister, DecimalRegister, BitRegister, TagValue, MapRegister, SimpleRegister
@@ -20,6 +19,10 @@ TAG, TAG_DESC = 'tag', "Tag"
 DESCRIPTION, DESCRIPTION_DESC = 'description', "Description"
 GROUP, GROUP_DESC = 'group', "Tag Group"
 DEVICE, DEVICE_DESC = 'device', "Device"
+UNIT, UNIT_DESC = 'unit', "Unit ID"
+
+DEFAULT_UNIT = 1
+MIN_UNIT, MAX_UNIT = 0, 247
 
 
 class RegisterParser:
@@ -36,6 +39,7 @@ class RegisterParser:
         self.group_cell = -1
         self.tag_cell = 0
         self.device_cell = -1
+        self.unit_cell = -1
 
     def set_cells(self, cells):
         self.number_cell = cells[NUMBER]
@@ -46,28 +50,47 @@ class RegisterParser:
         self.value_max_cell = cells[VALUE_MAX]
         self.tag_cell = cells[TAG]
         self.group_cell = cells[GROUP]
-
-    def parse(self, lines) -> Register:
-        """Parse a register from specification rows."""
+        self.device_cell = cells[DEVICE]
+        self.unit_cell = cells[UNIT]
+
+    def device(self, line):
+        """The device a register belongs to; defaults to 'main' if not specified."""
+        if self.device_cell == -1:
+            return 'main'
+        return line[self.device_cell] or 'main'
+
+    def unit(self, line):
+        """The Modbus unit id of a register, None if not specified."""
+        if self.unit_cell == -1 or not line[self.unit_cell]:
+            return None
+        value = line[self.unit_cell]
+        if not value.isdigit() or not MIN_UNIT <= int(value) <= MAX_UNIT:
+            raise ValueError(f'Invalid unit id "{value}" (expected {MIN_UNIT}-{MAX_UNIT}).')
+        return int(value)
+
+    def parse(self, lines, start=0) -> Register:
+        """Parse a register from the specification rows beginning at row `start`."""
         pass
 
 
 class IntRegisterParser(RegisterParser):
 
-    def parse(self, lines):
-        line = lines[0]
+    def parse(self, lines, start=0):
+        line = lines[start]
         return IntRegister(
             number=line[self.number_cell],
             size=line[self.size_cell],
             group=line[self.group_cell],
             tag=line[self.tag_cell],
             description=line[self.description_cell],
+            device=self.device(line),
+            unit=self.unit(line),
         )
 
 class DecimalRegisterParser(RegisterParser):
 
-    def parse(self, lines):
-        spec = lines[0]
+    def parse(self, lines, start=0):
+        spec = lines[start]
         decimal_places = int(spec[self.type_cell].split()[1])
         return DecimalRegister(
             number=spec[self.number_cell],
@@ -76,16 +99,18 @@ class DecimalRegisterParser(RegisterParser):
             tag=spec[self.tag_cell],
             description=spec[self.description_cell],
             decimal_places=decimal_places,
+            device=self.device(spec),
+            unit=self.unit(spec),
         )
 
 
 class MapRegisterParser(RegisterParser):
 
-    def parse(self, lines):
-        spec = lines[0]
+    def parse(self, lines, start=0):
+        spec = lines[start]
         value_parser = int  # TODO: in a map, only integers seem sensible?
         value_map = {}
-        for i in count(1):
+        for i in range(start + 1, len(lines)):
             line = lines[i]
             if line[self.number_cell]:  # assume that bitmap lines don't have number
                 log.debug(f"End of mapping detected. (Row: {i})")
@@ -107,15 +132,17 @@ class MapRegisterParser(RegisterParser):
             description=spec[self.description_cell],
             value_parser=value_parser,
             value_map=value_map,
+            device=self.device(spec),
+            unit=self.unit(spec),
         )
 
 
 class BitRegisterParser(RegisterParser):
 
-    def parse(self, lines):
-        spec = lines[0]
+    def parse(self, lines, start=0):
+        spec = lines[start]
         bit_map = {}
-        for i in count(1):
+        for i in range(start + 1, len(lines)):
             line = lines[i]
             if line[self.number_cell]:  # assume that bitmap lines don't have number
                 log.debug(f"End of bit mapping detected. (Row: {i})")
@@ -140,6 +167,8 @@ class BitRegisterParser(RegisterParser):
             size=spec[self.size_cell],
             group=spec[self.group_cell],
             bit_map=bit_map,
+            device=self.device(spec),
+            unit=self.unit(spec),
         )
 
 class FileParser:
@@ -197,6 +226,7 @@ class RegisterLoader:
             DESCRIPTION: ("Description", self.columns[DESCRIPTION]),
             GROUP: ("Tag Group", self.columns[GROUP]),
             DEVICE: ("Device", self.columns[DEVICE]),
+            UNIT: ("Unit ID", self.columns.get(UNIT, [])),
         }
 
         cells = { key: -1 for key in options.keys() }
@@ -244,6 +274,7 @@ class RegisterLoader:
             p.set_cells(cells)
 
         registers = []
+        device_units = {}
         skipped = 1
         for i, line in enumerate(lines[skipped:]):
             pos = i+skipped
@@ -262,7 +293,10 @@ class RegisterLoader:
             register = None
             for pattern, parser in self.parsers.items():
                 if pattern.match(line[format_cell]):
-                    register = parser.parse(lines[pos:])
+                    try:
+                        register = parser.parse(lines, pos)
+                    except ValueError as e:
+                        raise ValueError(f"Unable to parse register {number} (Row: {pos+1}): {e}") from e
                     if isinstance(register, SimpleRegister):
                         log.info(f'Register {number} ("{register.description}") -> Tag {register.tag} ({type(register).__qualname__}).')
                     elif isinstance(register, BitRegister):
@@ -277,6 +311,12 @@ class RegisterLoader:
                 log.warning(f'Register {number} ("{line[description_cell]}") skipped (unknown format: "{line[format_cell]}").')
                 continue
 
+            # a unit id applies to all following registers of the same device
+            if register.unit is None:
+                register.unit = device_units.get(register.device, DEFAULT_UNIT)
+            else:
+                device_units[register.device] = register.unit
+
             registers.append(register)
         return registers
 
@@ -14,13 +14,18 @@ from pymodbus.client import AsyncModbusTcpClient
 
 from modbus_reader.config import Configuration
 from modbus_reader.core import assemble_groups, format_message, collect_data
+from modbus_reader.gateway import Gateway
 from modbus_reader.mqtt import MqttClient
 from modbus_reader.parser import RegisterLoader, CsvParser
+from modbus_reader.supervisor import Supervisor
 from modbus_reader.util import next_timestamp
 
 # Configuration
 CONFIG_DIR = '/etc/modbus_reader/'
+REGISTERS_FILE = 'registers.csv'
+MAPPING_FILE = 'mapping.toml'
 LOG_FORMAT = '%(asctime)s [%(levelname)s] %(name)s:%(lineno)d — %(message)s'
+WORKER_LOG_FORMAT = '%(asctime)s [%(levelname)s] %(processName)s %(name)s:%(lineno)d — %(message)s'
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
 
 MQTT_HOST = 'localhost'
@@ -28,25 +33,13 @@ MQTT_PORT = 1883
 
 
 
-async def main():
-
-    arg_parser = argparse.ArgumentParser()
-    arg_parser.add_argument("-c", "--configdir", required=False)
-    args = arg_parser.parse_args()
+def load_groups(configuration, config_dir):
+    """Load the register definitions and assemble the measurement groups.
 
-    # init configuration
-    config_dir = os.path.abspath(args.configdir or CONFIG_DIR)
-    configuration = Configuration(config_dir)
-
-    # init logging
+    Returns a dictionary of measurement groups mapped to their sampling
+    interval (in seconds).
+    """
     log = logging.getLogger(__name__)
-    logging.basicConfig(
-        datefmt=DATE_FORMAT,
-        format=LOG_FORMAT,
-        level=configuration.logging.level,
-        handlers=[logging.StreamHandler(sys.stdout)],
-        force=True,
-    )
 
     # read registers
     file_parser = CsvParser(
@@ -67,9 +60,10 @@ async def main():
         description=configuration.mapping.registers.description,
         device=configuration.mapping.registers.device,
         group=configuration.mapping.registers.group,
+        unit=configuration.mapping.registers.unit if 'unit' in configuration.mapping.registers else [],
     )
 
-    with open(os.path.join(config_dir, 'registers.csv')) as csv_file:
+    with open(os.path.join(config_dir, REGISTERS_FILE)) as csv_file:
         registers = loader.load_from_lines(file_parser.read_lines(csv_file))
     log.info(f"Found {len(registers)} register definitions.")
 
@@ -85,16 +79,122 @@ async def main():
             ) for group in groups
         }
     except KeyError as e:
-        log.error(f"Unable to resolve sampling interval for group '{e}'.")
-        sys.exit(2)
+        raise ValueError(f"Unable to resolve sampling interval for group '{e}'.")
 
     for group in groups:
-        log.info(f'Group "{group.name}": Interval {group_intervals[group]} seconds')
+        log.info(f'Group "{group.name}" (Device "{group.device}"): Interval {group_intervals[group]} seconds')
         for i, sequence in enumerate(group.sequences):
             log.info(f'  - Sequence {i+1}:')
             for register in sequence:
                 log.info(f'     - Register {register.number}')
 
+    return group_intervals
+
+
+def init_logging(configuration, log_format=LOG_FORMAT):
+    logging.basicConfig(
+        datefmt=DATE_FORMAT,
+        format=log_format,
+        level=configuration.logging.level,
+        handlers=[logging.StreamHandler(sys.stdout)],
+        force=True,
+    )
+
+
+async def main():
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("-c", "--configdir", required=False)
+    arg_parser.add_argument("-w", "--workers", type=int, default=1,
+                            help="Number of worker processes to shard the devices across. "
+                                 "Each worker opens its own connection to the Modbus gateway.")
+    args = arg_parser.parse_args()
+
+    # init configuration
+    config_dir = os.path.abspath(args.configdir or CONFIG_DIR)
+    configuration = Configuration(config_dir)
+
+    # init logging
+    log = logging.getLogger(__name__)
+    init_logging(configuration)
+
+    try:
+        group_intervals = load_groups(configuration, config_dir)
+    except ValueError as e:
+        log.error(str(e))
+        sys.exit(2)
+
+    if args.workers > 1:
+        # all devices are behind the one configured gateway
+        log.warning(
+            f"Each of the {args.workers} workers opens its own connection to the Modbus gateway "
+            f"{configuration.modbus.host}:{configuration.modbus.port}; the gateway has to accept "
+            f"{args.workers} connections with one request in flight each.")
+        await supervise(configuration, config_dir, args.workers, group_intervals)
+    else:
+        await serve(configuration, group_intervals)
+
+
+async def supervise(configuration, config_dir, workers, group_intervals):
+    """Run as supervisor, sharding the devices across worker processes."""
+    log = logging.getLogger(__name__)
+
+    try:
+        mqtt_client = MqttClient(configuration.mqtt.host, configuration.mqtt.port)
+        await mqtt_client.start()
+    except Exception as e:
+        log.error(f"Unable to connect to MQTT server: {str(e)}")
+        sys.exit(2)
+
+    supervisor = Supervisor(
+        workers=workers,
+        target=run_worker,
+        config_dir=config_dir,
+        # reload the configuration as well to pick up changed intervals
+        load=lambda: load_groups(Configuration(config_dir), config_dir),
+        paths=[os.path.join(config_dir, REGISTERS_FILE), os.path.join(config_dir, MAPPING_FILE)],
+        mqtt_client=mqtt_client,
+    )
+
+    stop_event = Event()
+
+    def stop():
+        log.info("Stop signal received. Shutting down ...")
+        stop_event.set()
+
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGINT, stop)
+    loop.add_signal_handler(signal.SIGTERM, stop)
+
+    try:
+        log.info(f"Supervisor started ({workers} workers). Press CTRL-C to exit.")
+        await supervisor.run(group_intervals, stop_event)
+    finally:
+        mqtt_client.stop()
+
+
+def run_worker(index, config_dir, group_intervals, metrics):
+    """Entry point of a worker process serving a shard of the devices.
+
+    The measurement groups are loaded once by the supervisor and handed over;
+    the worker only reads the service configuration for its own connections.
+    """
+    configuration = Configuration(config_dir)
+    init_logging(configuration, WORKER_LOG_FORMAT)
+    # the supervisor takes care of SIGTERM and forwards a SIGINT
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(serve(configuration, group_intervals, worker=index, metrics=metrics))
+
+
+async def serve(configuration, group_intervals, worker=None, metrics=None):
+    """Sample the given measurement groups until stopped.
+
+    If a metrics queue is given, a summary of each collected sample is put
+    into it to be picked up by the supervisor.
+    """
+    log = logging.getLogger(__name__)
+    groups = list(group_intervals)
+
     try :
         modbus_client = AsyncModbusTcpClient(configuration.modbus.host, port=configuration.modbus.port)
         await modbus_client.connect()
@@ -109,6 +209,35 @@ async def main():
         log.error(f"Unable to connect to MQTT server: {str(e)}")
         sys.exit(2)
 
+    gateway = Gateway(modbus_client)
+
+    async def sample(group, due_ts):
+        log.info(f"Collecting data for measurement group: {group.name} (Device: {group.device})")
+        started = time.monotonic()
+        await asyncio.gather(*(
+            collect_data(gateway, sequence, group.values, index)
+            for sequence, index in zip(group.sequences, group.offsets)
+        ))
+        log.info(f"Collected measurement group '{group.name}': {len(group.tags)} tags.")
+        if log.isEnabledFor(logging.DEBUG):
+            for tag, value in zip(group.tags, group.values):
+                log.debug(f" - {tag} =  {value} ({type(value).__qualname__ if value is not None else '-'})")
+        topic, payload = format_message(due_ts, group.device, group)
+        log.debug(f"Publishing MQTT message to {topic}: {payload}")
+        mqtt_client.publish(topic, payload)
+        if metrics is not None:
+            metrics.put({
+                'worker': worker,
+                'device': group.device,
+                'group': group.name,
+                'time': due_ts,
+                'tags': len(group.tags),
+                'duration': time.monotonic() - started,
+            })
+        next_ts = next_timestamp(group_intervals[group])
+        next_timestamps[group] = next_ts
+        log.info(f"Next sample: {datetime.fromtimestamp(next_ts).isoformat()}")
+
     # === main loop ====
 
     stop_event = Event()
@@ -133,23 +262,12 @@ async def main():
 
             now = time.time()
 
-            for group in groups:
-                due_ts = next_timestamps[group]
-                if now > due_ts:
-                    log.info(f"Collecting data for measurement group: {group.name}")
-                    tag_values = []
-                    for sequence in group.sequences:
-                        tag_values.extend(await collect_data(modbus_client, sequence))
-                    log.info(f"Collected measurement group '{group.name}': {len(tag_values)} tags.")
-                    if log.isEnabledFor(logging.DEBUG):
-                        for tag_value in tag_values:
-                            log.debug(f" - {tag_value.tag} =  {tag_value.value} ({type(tag_value.value).__qualname__ if tag_value.value is not None else '-'})")
-                    topic, payload = format_message(due_ts, 'main', group.name, tag_values)
-                    log.debug(f"Publishing MQTT message to {topic}: {payload}")
-                    mqtt_client.publish(topic, payload)
-                    next_ts = next_timestamp(group_intervals[group])
-                    next_timestamps[group] = next_ts
-                    log.info(f"Next sample: {datetime.fromtimestamp(next_ts).isoformat()}")
+            # sample all due groups concurrently, the gateway serializes the
+            # requests and takes turns across the units
+            await asyncio.gather(*(
+                sample(group, next_timestamps[group])
+                for group in groups if now > next_timestamps[group]
+            ))
 
             with suppress(TimeoutError):
                 await asyncio.wait_for(stop_event.wait(), timeout=10)
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import signal
+import time
+from contextlib import suppress
+from datetime import datetime, timezone
+
+from modbus_reader.util import shard_of
+
+log = logging.getLogger(__name__)
+
+HEALTH_TOPIC = 'te/device/main/service/modbus-reader/status/health'
+
+
+class Worker:
+    """A worker process serving a shard of the devices."""
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.shard = {}
+        self.fingerprint = None
+        self.restarts = 0
+        self.failures = 0  # consecutive crashes, for the restart backoff
+        self.started = None
+        self.restart_at = None
+        self.samples = 0
+        self.tags = 0
+        self.last_sample = None
+
+    @property
+    def name(self):
+        return f'worker-{self.index}'
+
+    @property
+    def devices(self):
+        return sorted({group.device for group in self.shard})
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class Supervisor:
+    """Runs the measurement groups in worker processes, sharded by device.
+
+    Each device is assigned to a worker by a stable hash of its name, hence
+    a worker (and its connections) is only restarted if the registers of its
+    own devices change. The register definitions are checked for changes
+    periodically to rebalance the shards.
+    """
+
+    def __init__(self, workers, target, config_dir, load, paths, mqtt_client, interval=10,
+                 restart_delay=5, max_restart_delay=300, stop_timeout=15):
+        self.workers = [Worker(i) for i in range(workers)]
+        self.target = target
+        self.config_dir = config_dir
+        self.load = load
+        self.paths = paths  # files of the register definitions, watched for changes
+        self.mqtt_client = mqtt_client
+        self.interval = interval
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stop_timeout = stop_timeout
+        self.context = multiprocessing.get_context('spawn')
+        self.metrics = self.context.Queue()
+        self.mtimes = None
+
+    async def run(self, group_intervals, stop_event):
+        self.mtimes = self.modification_times()
+        await self.assign(group_intervals)
+        try:
+            while not stop_event.is_set():
+                self.collect_metrics()
+                await self.check_registers()
+                self.check_workers()
+                self.publish_health()
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(stop_event.wait(), timeout=self.interval)
+        finally:
+            await self.stop_workers(self.workers)
+
+    async def assign(self, group_intervals):
+        """Distribute the measurement groups across the workers.
+
+        Workers whose shard changed are (re)started, all others are left
+        untouched.
+        """
+        shards = [{} for _ in self.workers]
+        for group, interval in group_intervals.items():
+            shards[shard_of(group.device, len(self.workers))][group] = interval
+
+        changed = []
+        for worker, shard in zip(self.workers, shards):
+            fingerprint = pickle.dumps(shard)
+            if fingerprint != worker.fingerprint:
+                changed.append((worker, shard, fingerprint))
+
+        await self.stop_workers([worker for worker, _, _ in changed])
+        for worker, shard, fingerprint in changed:
+            worker.shard = shard
+            worker.fingerprint = fingerprint
+            worker.failures = 0
+            worker.restart_at = None
+            log.info(f"Assigned {len(shard)} measurement groups to {worker.name}. Devices: {', '.join(worker.devices) or '-'}")
+            self.start_worker(worker)
+
+    def start_worker(self, worker):
+        if not worker.shard:
+            log.info(f"No devices assigned to {worker.name}. Not starting.")
+            return
+        worker.process = self.context.Process(
+            name=worker.name,
+            target=self.target,
+            args=(worker.index, self.config_dir, worker.shard, self.metrics),
+            daemon=False,
+        )
+        worker.process.start()
+        worker.started = time.monotonic()
+        log.info(f"Started {worker.name} (PID {worker.process.pid}).")
+
+    async def stop_workers(self, workers):
+        """Stop the given workers in parallel, killing those that don't stop in time.
+
+        The workers are interrupted (SIGINT) to shut down gracefully; they
+        ignore SIGTERM, hence the fallback is SIGKILL.
+        """
+        workers = [worker for worker in workers if worker.is_alive()]
+        for worker in workers:
+            log.info(f"Stopping {worker.name} (PID {worker.process.pid}) ...")
+            with suppress(ProcessLookupError):
+                os.kill(worker.process.pid, signal.SIGINT)
+        await asyncio.gather(*(
+            asyncio.to_thread(worker.process.join, self.stop_timeout)
+            for worker in workers
+        ))
+        for worker in workers:
+            if worker.process.is_alive():
+                log.warning(f"{worker.name} did not stop within {self.stop_timeout} seconds. Killing.")
+                worker.process.kill()
+                await asyncio.to_thread(worker.process.join)
+
+    def check_workers(self):
+        """Restart crashed workers, with an exponential backoff for each worker."""
+        now = time.monotonic()
+        for worker in self.workers:
+            if not worker.shard or worker.is_alive():
+                continue
+            if worker.restart_at is None:
+                # a worker that ran for a while is not considered crash-looping
+                if worker.started is not None and now - worker.started > self.max_restart_delay:
+                    worker.failures = 0
+                delay = min(self.restart_delay * 2 ** worker.failures, self.max_restart_delay)
+                worker.failures += 1
+                worker.restart_at = now + delay
+                exitcode = worker.process.exitcode if worker.process else None
+                log.warning(f"{worker.name} is not running (Exit code: {exitcode}). Restarting in {delay} seconds.")
+            if now >= worker.restart_at:
+                worker.restart_at = None
+                worker.restarts += 1
+                self.start_worker(worker)
+
+    def modification_times(self):
+        return [os.path.getmtime(path) for path in self.paths]
+
+    async def check_registers(self):
+        """Reload the register definitions and rebalance if they changed."""
+        try:
+            mtimes = self.modification_times()
+        except OSError as e:
+            log.error(f"Unable to check register definitions: {str(e)}")
+            return
+        if mtimes == self.mtimes:
+            return
+        log.info("Register definitions changed. Rebalancing workers.")
+        self.mtimes = mtimes
+        try:
+            group_intervals = self.load()
+        except Exception as e:
+            log.error(f"Unable to reload register definitions, keeping current assignment: {str(e)}")
+            return
+        await self.assign(group_intervals)
+
+    def collect_metrics(self):
+        """Drain the sample summaries reported by the workers."""
+        while True:
+            try:
+                sample = self.metrics.get_nowait()
+            except queue.Empty:
+                break
+            worker = self.workers[sample['worker']]
+            worker.samples += 1
+            worker.tags += sample['tags']
+            worker.last_sample = sample['time']
+            log.debug(f"{worker.name}: Sampled '{sample['group']}' of device '{sample['device']}', "
+                      f"{sample['tags']} tags in {sample['duration']:.3f} seconds.")
+
+    def health(self):
+        workers = [
+            {
+                'name': worker.name,
+                'pid': worker.process.pid if worker.is_alive() else None,
+                'status': 'up' if worker.is_alive() else 'down',
+                'devices': worker.devices,
+                'restarts': worker.restarts,
+                'samples': worker.samples,
+                'tags': worker.tags,
+                'lastSample': worker.last_sample,
+            }
+            for worker in self.workers if worker.shard
+        ]
+        return {
+            'status': 'up' if all(w['status'] == 'up' for w in workers) else 'down',
+            'pid': os.getpid(),
+            'time': datetime.fromtimestamp(time.time(), timezone.utc).isoformat(),
+            'samples': sum(w['samples'] for w in workers),
+            'tags': sum(w['tags'] for w in workers),
+            'workers': workers,
+        }
+
+    def publish_health(self):
+        self.mqtt_client.publish(HEALTH_TOPIC, json.dumps(self.health()))
@@ -1,5 +1,6 @@
 import math
 import time
+import zlib
 from datetime import timezone, datetime, timedelta
 
 
@@ -9,3 +10,13 @@ def now():
 def next_timestamp(interval):
     now_ts = time.time()
     return int(math.ceil(now_ts / interval) * interval)
+
+
+def shard_of(key, shards):
+    """Stable shard index of a key (e.g. a device name).
+
+    Uses rendezvous hashing so that the assignment doesn't depend on the
+    Python hash seed and changing the number of shards only moves the keys
+    of the added/removed shards.
+    """
+    return max(range(shards), key=lambda shard: zlib.crc32(f'{key}/{shard}'.encode()))
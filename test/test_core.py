@@ -0,0 +1,109 @@
+import asyncio
+import json
+from enum import Enum
+
+import pytest
+
+pytest.importorskip("pymodbus")
+
+from pymodbus.exceptions import ModbusIOException
+
+from modbus_reader.core import assemble_groups, collect_data, format_message
+from modbus_reader.model import IntRegister, DecimalRegister
+
+
+class FakeResponse:
+
+    def __init__(self, registers):
+        self.registers = registers
+
+    def isError(self):
+        return False
+
+
+class FakeClient:
+
+    class DATATYPE(Enum):
+        INT32 = 'i'
+
+    def __init__(self, error=None):
+        self.error = error
+        self.requests = []
+
+    async def read_holding_registers(self, address, count, device_id):
+        self.requests.append((address, count, device_id))
+        if self.error:
+            raise self.error
+        return FakeResponse([0, 42] * (count // 2))
+
+    def convert_from_registers(self, registers, data_type, word_order):
+        return registers[1::2]
+
+
+def test_assemble_groups_splits_units():
+
+    registers = [
+        IntRegister(40000, 2, 'g', 'g.a', 'A', unit=1),
+        IntRegister(40002, 2, 'g', 'g.b', 'B', unit=1),
+        IntRegister(40004, 2, 'g', 'g.c', 'C', unit=2),
+    ]
+    groups = assemble_groups(registers)
+
+    assert len(groups) == 1
+    assert [[register.number for register in sequence] for sequence in groups[0].sequences] == [[40000, 40002], [40004]]
+    assert [sequence[0].unit for sequence in groups[0].sequences] == [1, 2]
+
+
+def test_assemble_groups_by_device():
+
+    registers = [
+        IntRegister(40000, 2, 'g', 'g.a', 'A', device='d1'),
+        IntRegister(40002, 2, 'g', 'g.b', 'B', device='d2'),
+        IntRegister(40004, 2, 'h', 'h.c', 'C', device='d1'),
+        IntRegister(40006, 2, 'g', 'g.d', 'D', device='d1'),
+    ]
+    groups = assemble_groups(registers)
+
+    assert sorted((group.device, group.name) for group in groups) == [('d1', 'g'), ('d1', 'h'), ('d2', 'g')]
+    group, = [group for group in groups if (group.device, group.name) == ('d1', 'g')]
+    assert [[register.number for register in sequence] for sequence in group.sequences] == [[40000], [40006]]
+    assert group.tags == ('g.a', 'g.d')
+
+
+def test_format_message_publishes_to_device():
+
+    group, = assemble_groups([
+        IntRegister(40000, 2, 'g', 'g.a', 'A', device='d1'),
+        IntRegister(40002, 2, 'g', 'g.b', 'B', device='d1'),
+    ])
+    group.values[:] = [42, None]
+
+    topic, payload = format_message(0, group.device, group)
+    assert topic == 'te/device/d1///m/'
+    assert json.loads(payload) == {'time': '1970-01-01T00:00:00+00:00', 'g': {'a': 42}}
+
+
+def test_collect_data_passes_unit():
+
+    group, = assemble_groups([
+        IntRegister(40010, 2, 'g', 'g.a', 'A', unit=7),
+        DecimalRegister(40012, 2, 'g', 'g.b', 'B', 1, unit=7),
+    ])
+    client = FakeClient()
+
+    assert asyncio.run(collect_data(client, group.sequences[0], group.values, 0))
+    assert client.requests == [(10, 4, 7)]
+    assert group.values == [42, 4.2]
+
+
+def test_collect_data_resets_values_on_exception():
+
+    group, = assemble_groups([
+        IntRegister(40000, 2, 'g', 'g.a', 'A', unit=1),
+        IntRegister(40004, 2, 'g', 'g.b', 'B', unit=1),
+    ])
+    group.values[:] = [1, 2]
+    client = FakeClient(error=ModbusIOException("timeout"))
+
+    assert not asyncio.run(collect_data(client, group.sequences[1], group.values, group.offsets[1]))
+    assert group.values == [1, None]
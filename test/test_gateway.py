@@ -0,0 +1,93 @@
+import asyncio
+
+from modbus_reader.gateway import Gateway
+
+
+class FakeClient:
+    """Serializes the requests like pymodbus, which locks the whole transaction."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.lock = asyncio.Lock()
+        self.inflight = 0
+        self.max_inflight = 0
+        self.requests = []
+
+    async def read_holding_registers(self, address, count, device_id):
+        async with self.lock:
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+            self.requests.append(device_id)
+            await asyncio.sleep(self.delays.get(device_id, 0))
+            self.inflight -= 1
+            return address
+
+
+def test_gateway_round_robin():
+
+    client = FakeClient({})
+    gateway = Gateway(client)
+
+    async def run():
+        return await asyncio.gather(*(
+            gateway.read_holding_registers(i, count=2, device_id=unit)
+            for i, unit in enumerate([1, 1, 1, 2, 2, 3])
+        ))
+
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4, 5]
+    assert client.max_inflight == 1
+    assert client.requests == [1, 1, 2, 3, 1, 2]
+    assert not gateway.busy
+
+
+def test_gateway_slow_unit_does_not_starve_others():
+
+    client = FakeClient({1: 0.02})
+    gateway = Gateway(client)
+    finished = []
+
+    async def read(unit):
+        await gateway.read_holding_registers(0, count=2, device_id=unit)
+        finished.append(unit)
+
+    async def run():
+        await asyncio.gather(*(read(unit) for unit in [1, 1, 1] + [2] * 5))
+
+    asyncio.run(run())
+    # first come, first served would be [1, 1, 1, 2, 2, 2, 2, 2]
+    assert finished == [1, 1, 2, 1, 2, 2, 2, 2]
+
+
+def test_gateway_request_cancelled_while_waiting():
+
+    client = FakeClient({})
+    gateway = Gateway(client)
+    release = asyncio.Event()
+
+    async def read(address, count, device_id):
+        if device_id == 1:
+            await release.wait()
+        return address
+
+    client.read_holding_registers = read
+
+    async def run():
+        first = asyncio.create_task(gateway.read_holding_registers(1, count=2, device_id=1))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(gateway.read_holding_registers(2, count=2, device_id=2))
+        third = asyncio.create_task(gateway.read_holding_registers(3, count=2, device_id=3))
+        await asyncio.sleep(0)
+        assert gateway.busy
+
+        # complete the request in flight and cancel a waiting one in the same tick
+        release.set()
+        second.cancel()
+
+        assert await asyncio.wait_for(first, 1) == 1
+        assert await asyncio.wait_for(third, 1) == 3
+        assert second.cancelled()
+
+    asyncio.run(run())
+    assert not gateway.busy
+    assert not gateway.ring and not gateway.waiting
+
@@ -0,0 +1,24 @@
+from modbus_reader.model import DecimalRegister, BitRegister, TagValue, MeasurementGroup, IntRegister
+
+
+def test_measurement_group_values():
+
+    decimal = DecimalRegister(40000, 2, 'g', 'g.temp', 'Temperature', 1)
+    bits = BitRegister(40002, 2, 'g', {
+        1: TagValue('g.flag_a', 'Flag A', 1),
+        4: TagValue('g.flag_c', 'Flag C', 4),
+    })
+    total = IntRegister(40010, 2, 'g', 'g.total', 'Total')
+    group = MeasurementGroup('g', [(decimal, bits), (total,)])
+
+    assert group.tags == ('g.temp', 'g.flag_a', 'g.flag_c', 'g.total')
+    assert list(group.offsets) == [0, 3]
+    assert group.values == [None] * 4
+
+    index = 0
+    for register, raw_value in zip(group.sequences[0], [215, 5]):
+        index += register.parse(raw_value, group.values, index)
+    group.sequences[1][0].parse(42, group.values, group.offsets[1])
+
+    assert index == 3
+    assert group.values == [21.5, 1, 1, 42]
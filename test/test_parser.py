@@ -0,0 +1,95 @@
+import pytest
+
+from modbus_reader.parser import RegisterLoader, DEFAULT_UNIT
+
+COLUMNS = {
+    'number': ['Reg.*'],
+    'size': ['Words'],
+    'type': ['Format'],
+    'uom': ['UOM'],
+    'value': ['Val.*'],
+    'min': ['Min'],
+    'max': ['Max'],
+    'tag': ['Tag'],
+    'description': ['Desc.*'],
+    'device': ['Dev.*'],
+    'unit': ['Slave.*', 'Unit.?I[Dd]'],
+    'group': ['Group'],
+}
+
+
+def load(header, rows):
+    loader = RegisterLoader()
+    loader.set_columns(**COLUMNS)
+    return loader.load_from_lines([header] + rows)
+
+
+def test_units():
+
+    header = ['Register', 'Words', 'Format', 'Min', 'Description', 'Tag', 'Group', 'Device', 'Unit ID']
+    registers = load(header, [
+        ['40000', '2', 'INT', '', 'A', 'g.a', 'g', 'd1', ''],
+        ['40002', '2', 'INT', '', 'B', 'g.b', 'g', 'd1', '3'],
+        ['40004', '2', 'INT', '', 'C', 'g.c', 'g', 'd1', ''],  # same device, carries over
+        ['40006', '2', 'INT', '', 'D', 'g.d', 'g', 'd2', ''],  # other device, default
+        ['40008', '2', 'INT', '', 'E', 'g.e', 'g', 'd1', '0'],
+        ['40010', '2', 'INT', '', 'F', 'g.f', 'g', 'd1', ''],
+    ])
+
+    assert [register.unit for register in registers] == [DEFAULT_UNIT, 3, 3, DEFAULT_UNIT, 0, 0]
+
+
+def test_units_without_unit_column():
+
+    header = ['Register', 'Words', 'Format', 'Min', 'Description', 'Tag', 'Group']
+    registers = load(header, [
+        ['40000', '2', 'INT', '', 'A', 'g.a', 'g'],
+        ['40002', '2', 'INT', '', 'B', 'g.b', 'g'],
+    ])
+
+    assert [register.unit for register in registers] == [DEFAULT_UNIT, DEFAULT_UNIT]
+
+
+@pytest.mark.parametrize("unit", ["248", "-1", "x"])
+def test_invalid_unit(unit):
+
+    header = ['Register', 'Words', 'Format', 'Min', 'Description', 'Tag', 'Group', 'Slave']
+    with pytest.raises(ValueError, match=rf'register 40002 \(Row: 3\).*"{unit}"'):
+        load(header, [
+            ['40000', '2', 'INT', '', 'A', 'g.a', 'g', '1'],
+            ['40002', '2', 'INT', '', 'B', 'g.b', 'g', unit],
+        ])
+
+
+def test_devices():
+
+    header = ['Register', 'Words', 'Format', 'Min', 'Description', 'Tag', 'Group', 'Device']
+    registers = load(header, [
+        ['40000', '2', 'INT', '', 'A', 'g.a', 'g', ''],
+        ['40002', '2', 'INT', '', 'B', 'g.b', 'g', 'd1'],
+        ['40004', '2', 'INT', '', 'C', 'g.c', 'g', 'd2'],
+    ])
+
+    assert [register.device for register in registers] == ['main', 'd1', 'd2']
+
+
+def test_devices_without_device_column():
+
+    header = ['Register', 'Words', 'Format', 'Min', 'Description', 'Tag', 'Group']
+    registers = load(header, [['40000', '2', 'INT', '', 'A', 'g.a', 'g']])
+
+    assert registers[0].device == 'main'
+
+
+def test_trailing_bit_register():
+
+    header = ['Register', 'Words', 'Format', 'Min', 'Description', 'Tag', 'Group']
+    registers = load(header, [
+        ['40000', '2', 'INT', '', 'A', 'g.a', 'g'],
+        ['40002', '1', 'BIT', '', '', 'MULTIPLE', 'g'],
+        ['', '', '', '1', 'Flag 0', 'g.flag_0', ''],
+        ['', '', '', '2', 'Flag 1', 'g.flag_1', ''],
+    ])
+
+    assert [register.number for register in registers] == [40000, 40002]
+    assert [tag for tag, _ in registers[1].tags()] == ['g.flag_0', 'g.flag_1']
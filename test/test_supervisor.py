@@ -0,0 +1,197 @@
+import os
+import asyncio
+from itertools import count
+
+import pytest
+
+from modbus_reader import supervisor as supervisor_module
+from modbus_reader.model import MeasurementGroup
+from modbus_reader.supervisor import Supervisor
+from modbus_reader.util import shard_of
+
+pids = count(100000)
+
+
+class FakeProcess:
+
+    def __init__(self, name, target, args, daemon):
+        self.name = name
+        self.args = args
+        self.pid = None
+        self.exitcode = None
+        self.alive = False
+
+    def start(self):
+        self.pid = next(pids)
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def kill(self):
+        self.alive = False
+        self.exitcode = -9
+
+
+class FakeContext:
+
+    def __init__(self):
+        self.processes = []
+
+    def Process(self, **kwargs):
+        process = FakeProcess(**kwargs)
+        self.processes.append(process)
+        return process
+
+
+@pytest.fixture
+def supervisor(monkeypatch):
+    interrupted = []
+
+    def kill(pid, sig):
+        interrupted.append(pid)
+        for process in context.processes:
+            if process.pid == pid:
+                process.alive = False
+                process.exitcode = 0
+
+    monkeypatch.setattr(supervisor_module.os, 'kill', kill)
+    context = FakeContext()
+    instance = Supervisor(2, target=None, config_dir='/tmp', load=None, paths=[],
+                          mqtt_client=None, restart_delay=0)
+    instance.context = context
+    instance.interrupted = interrupted
+    return instance
+
+
+def devices_by_shard():
+    """Two device names per shard (of 2)."""
+    names = {0: [], 1: []}
+    for i in count():
+        name = f'device{i}'
+        shard = names[shard_of(name, 2)]
+        if len(shard) < 2:
+            shard.append(name)
+        if all(len(shard) == 2 for shard in names.values()):
+            return names
+
+
+def groups(devices, interval=60):
+    return {MeasurementGroup('g', [], device): interval for device in devices}
+
+
+def test_assign_restarts_changed_shards_only(supervisor):
+
+    devices = devices_by_shard()
+    asyncio.run(supervisor.assign(groups([devices[0][0], devices[1][0]])))
+    first, second = supervisor.workers
+    first_process, second_process = first.process, second.process
+    assert first_process.is_alive() and second_process.is_alive()
+
+    # add a device to the second shard only
+    asyncio.run(supervisor.assign(groups([devices[0][0], devices[1][0], devices[1][1]])))
+
+    assert first.process is first_process and first_process.is_alive()
+    assert second.process is not second_process and second.process.is_alive()
+    assert not second_process.is_alive()
+    assert supervisor.interrupted == [second_process.pid]
+    assert second.devices == sorted(devices[1])
+
+
+def test_check_workers_restarts_with_backoff(supervisor):
+
+    devices = devices_by_shard()
+    asyncio.run(supervisor.assign(groups([devices[0][0]])))
+    worker = supervisor.workers[0]
+    assert supervisor.workers[1].process is None  # nothing assigned
+
+    worker.process.alive = False
+    supervisor.check_workers()
+    assert worker.restarts == 1 and worker.failures == 1
+    assert worker.is_alive()
+
+    supervisor.restart_delay = 10
+    worker.process.alive = False
+    supervisor.check_workers()
+    assert worker.restarts == 1 and worker.failures == 2
+    assert not worker.is_alive()
+    assert worker.restart_at > 0
+
+    worker.restart_at = 0
+    supervisor.check_workers()
+    assert worker.restarts == 2
+    assert worker.is_alive()
+
+
+def test_health(supervisor):
+
+    devices = devices_by_shard()
+    asyncio.run(supervisor.assign(groups([devices[0][0], devices[1][0]])))
+    first, second = supervisor.workers
+    first.samples, first.tags = 2, 20
+    second.samples, second.tags = 3, 30
+
+    health = supervisor.health()
+    assert health['status'] == 'up'
+    assert health['samples'] == 5
+    assert health['tags'] == 50
+    assert [w['status'] for w in health['workers']] == ['up', 'up']
+
+    second.process.alive = False
+    health = supervisor.health()
+    assert health['status'] == 'down'
+    assert [w['status'] for w in health['workers']] == ['up', 'down']
+
+
+def test_stop_workers_kills_unresponsive_workers(supervisor, monkeypatch):
+
+    devices = devices_by_shard()
+    asyncio.run(supervisor.assign(groups([devices[0][0], devices[1][0]])))
+    monkeypatch.setattr(supervisor_module.os, 'kill', lambda pid, sig: None)  # ignore SIGINT
+
+    asyncio.run(supervisor.stop_workers(supervisor.workers))
+    assert [worker.process.exitcode for worker in supervisor.workers] == [-9, -9]
+
+
+def test_check_registers_rebalances_on_change(supervisor, tmp_path):
+
+    devices = devices_by_shard()
+    registers, mapping = tmp_path / 'registers.csv', tmp_path / 'mapping.toml'
+    registers.write_text('')
+    mapping.write_text('')
+    supervisor.paths = [str(registers), str(mapping)]
+    supervisor.mtimes = supervisor.modification_times()
+    assigned = [groups([devices[0][0]]), groups([devices[0][0], devices[1][0]])]
+    supervisor.load = lambda: assigned.pop(0)
+    asyncio.run(supervisor.assign(supervisor.load()))
+
+    asyncio.run(supervisor.check_registers())  # unchanged
+    assert supervisor.workers[1].process is None
+
+    os.utime(mapping, (0, 0))
+    asyncio.run(supervisor.check_registers())
+    assert supervisor.workers[1].is_alive()
+    assert supervisor.workers[1].devices == [devices[1][0]]
+
+
+def test_check_registers_keeps_assignment_on_error(supervisor, tmp_path):
+
+    devices = devices_by_shard()
+    registers = tmp_path / 'registers.csv'
+    registers.write_text('')
+    supervisor.paths = [str(registers)]
+    supervisor.mtimes = supervisor.modification_times()
+    asyncio.run(supervisor.assign(groups([devices[0][0]])))
+    process = supervisor.workers[0].process
+
+    def load():
+        raise ValueError("Unable to parse register")
+
+    supervisor.load = load
+    os.utime(registers, (0, 0))
+    asyncio.run(supervisor.check_registers())
+    assert supervisor.workers[0].process is process and process.is_alive()
+    assert supervisor.interrupted == []
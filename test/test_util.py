@@ -2,7 +2,7 @@ from datetime import timedelta
 
 import pytest
 
-from modbus_reader.util import now, next_timestamp
+from modbus_reader.util import now, next_timestamp, shard_of
 
 
 @pytest.mark.parametrize(
@@ -23,3 +23,17 @@ def test_next_timestamp(interval, expected_seconds):
     assert timestamp.second in expected_seconds
     assert timestamp < current + timedelta(seconds=interval)
     assert timestamp > current
+
+
+def test_shard_of():
+
+    devices = [f'device{i}' for i in range(100)]
+    shards = [shard_of(device, 4) for device in devices]
+
+    assert all(0 <= shard < 4 for shard in shards)
+    assert len(set(shards)) == 4
+    assert shards == [shard_of(device, 4) for device in devices]
+
+    # adding a shard only moves devices to the new shard
+    for device, shard in zip(devices, shards):
+        assert shard_of(device, 5) in (shard, 4)